@@ -9,4 +9,12 @@ class CountryAdmin(admin.ModelAdmin):
     list_display = ['name', 'region', 'population', 'currency_code', 'estimated_gdp', 'last_refreshed_at']
     list_filter = ['region', 'currency_code']
     search_fields = ['name', 'capital']
-    readonly_fields = ['last_refreshed_at']
\ No newline at end of file
+    readonly_fields = ['last_refreshed_at']
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # Trim columns on the changelist only; change forms need every field
+        changelist = f'{self.opts.app_label}_{self.opts.model_name}_changelist'
+        if request.resolver_match and request.resolver_match.url_name == changelist:
+            queryset = queryset.only('id', *self.list_display)
+        return queryset
\ No newline at end of file
@@ -0,0 +1,22 @@
+from django.core.cache import cache
+import time
+
+# Cached StatusView payload; dropped whenever the countries table changes
+STATUS_CACHE_KEY = 'status_payload'
+
+# Cache version shared by every cached view of the countries table. Set to a
+# fresh timestamp on change, so an evicted version can never revive old entries
+COUNTRIES_VERSION_KEY = 'countries_version'
+
+def countries_version():
+    """
+    Current cache version for data derived from the countries table
+    """
+    return cache.get_or_set(COUNTRIES_VERSION_KEY, time.time_ns, timeout=None)
+
+def invalidate_countries_cache():
+    """
+    Drop everything cached from the countries table after it changes
+    """
+    cache.set(COUNTRIES_VERSION_KEY, time.time_ns(), timeout=None)
+    cache.delete(STATUS_CACHE_KEY)
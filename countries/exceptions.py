@@ -0,0 +1,11 @@
+from rest_framework.views import exception_handler
+
+def api_exception_handler(exc, context):
+    """
+    DRF's default handler, reporting the message under 'error' rather than
+    'detail' to match the API's other error bodies
+    """
+    response = exception_handler(exc, context)
+    if response is not None and isinstance(response.data, dict) and 'detail' in response.data:
+        response.data['error'] = response.data.pop('detail')
+    return response
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-14 19:14
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("countries", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="country",
+            name="currency_code",
+            field=models.CharField(blank=True, db_index=True, max_length=3, null=True),
+        ),
+        migrations.AlterField(
+            model_name="country",
+            name="region",
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="country",
+            index=models.Index(
+                django.db.models.functions.text.Upper("name"),
+                name="country_name_upper_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="country",
+            index=models.Index(
+                django.db.models.functions.text.Upper("region"),
+                name="country_region_upper_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="country",
+            index=models.Index(
+                django.db.models.functions.text.Upper("currency_code"),
+                name="country_currency_upper_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="country",
+            index=models.Index(
+                fields=["-last_refreshed_at"], name="country_last_refresh_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="country",
+            index=models.Index(
+                condition=models.Q(("estimated_gdp__isnull", False)),
+                fields=["-estimated_gdp"],
+                name="country_gdp_notnull_desc",
+            ),
+        ),
+    ]
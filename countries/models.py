@@ -1,13 +1,36 @@
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Upper
 from django.core.exceptions import ValidationError
+from decimal import Decimal, ROUND_HALF_UP
 import random
+import zlib
+
+
+def gdp_multiplier(name):
+    """Per-country GDP multiplier in [1000, 2000], stable across refreshes and processes"""
+    # zlib.crc32 rather than hash(): str hashes are salted per interpreter
+    return random.Random(zlib.crc32(name.encode('utf-8'))).uniform(1000, 2000)
+
+def estimate_gdp(name, population, currency_code, exchange_rate):
+    """
+    Estimated GDP as stored on Country: 0 without a currency, None when the
+    currency has no exchange rate, else population * multiplier / rate in
+    Decimal arithmetic rounded to estimated_gdp's 2 decimal places
+    """
+    if not currency_code:
+        return Decimal('0.00')
+    if population is None or not exchange_rate:
+        return None
+    gdp = Decimal(population) * Decimal(gdp_multiplier(name)) / Decimal(exchange_rate)
+    return gdp.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
 class Country(models.Model):
     name = models.CharField(max_length=100, unique=True)
     capital = models.CharField(max_length=100, blank=True, null=True)
-    region = models.CharField(max_length=50, blank=True, null=True)
+    region = models.CharField(max_length=50, blank=True, null=True, db_index=True)
     population = models.BigIntegerField()
-    currency_code = models.CharField(max_length=3, blank=True, null=True)  # OPTIONAL for refresh behavior
+    currency_code = models.CharField(max_length=3, blank=True, null=True, db_index=True)  # OPTIONAL for refresh behavior
     exchange_rate = models.DecimalField(max_digits=20, decimal_places=10, blank=True, null=True)
     estimated_gdp = models.DecimalField(max_digits=30, decimal_places=2, blank=True, null=True)
     flag_url = models.URLField(blank=True, null=True)
@@ -16,6 +39,21 @@ class Country(models.Model):
     class Meta:
         db_table = 'countries'
         ordering = ['name']
+        indexes = [
+            # Case-insensitive name lookups and region/currency filters compare UPPER(column)
+            models.Index(Upper('name'), name='country_name_upper_idx'),
+            models.Index(Upper('region'), name='country_region_upper_idx'),
+            models.Index(Upper('currency_code'), name='country_currency_upper_idx'),
+            # Latest-refresh lookups (Max / order_by('-last_refreshed_at'))
+            models.Index(fields=['-last_refreshed_at'], name='country_last_refresh_idx'),
+            # Top-K by GDP (summary image, gdp_* sorts) skip NULL GDPs; MySQL
+            # ignores the condition and builds a plain descending index
+            models.Index(
+                fields=['-estimated_gdp'],
+                name='country_gdp_notnull_desc',
+                condition=Q(estimated_gdp__isnull=False),
+            ),
+        ]
     
     def clean(self):
         errors = {}
@@ -30,17 +68,11 @@ class Country(models.Model):
     
     def calculate_estimated_gdp(self):
         """Calculate estimated GDP based on population and exchange rate"""
-        if self.population and self.exchange_rate:
-            random_multiplier = random.uniform(1000, 2000)
-            gdp = (self.population * random_multiplier) / float(self.exchange_rate)
-            return round(gdp, 2)
-        return None
+        return estimate_gdp(self.name, self.population, self.currency_code, self.exchange_rate)
     
     def save(self, *args, **kwargs):
-        if self.population and self.exchange_rate:
-            self.estimated_gdp = self.calculate_estimated_gdp()
-        else:
-            self.estimated_gdp = None
+        # Same rules as refresh_countries_data, so saving a refreshed row keeps its GDP
+        self.estimated_gdp = self.calculate_estimated_gdp()
             
         self.full_clean()
         super().save(*args, **kwargs)
@@ -0,0 +1,13 @@
+from rest_framework.pagination import LimitOffsetPagination
+
+class CountryPagination(LimitOffsetPagination):
+    """
+    Opt-in ?limit=&offset= pagination for GET /countries; a bare ?offset=
+    gets default_limit rows, larger pages are capped at max_limit
+    """
+    default_limit = 50
+    max_limit = 500
+
+    def is_requested(self, request):
+        query_params = request.query_params
+        return self.limit_query_param in query_params or self.offset_query_param in query_params
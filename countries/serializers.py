@@ -2,6 +2,10 @@ from rest_framework import serializers
 from .models import Country
 
 class CountrySerializer(serializers.ModelSerializer):
+    # Fields validate() insists on; override per use with
+    # context={'required_fields': [...]}
+    default_required_fields = ['name', 'population']
+    
     class Meta:
         model = Country
         fields = [
@@ -15,11 +19,12 @@ class CountrySerializer(serializers.ModelSerializer):
         """
         Custom validation for required fields
         """
+        required_fields = self.context.get('required_fields', self.default_required_fields)
         errors = {}
-        if not data.get('name'):
-            errors['name'] = 'is required'
-        if data.get('population') is None:
-            errors['population'] = 'is required'
+        for field in required_fields:
+            value = data.get(field)
+            if value is None or value == '':
+                errors[field] = 'is required'
             
         if errors:
             raise serializers.ValidationError(errors)
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import invalidate_countries_cache
+from .models import Country
+
+@receiver(post_save, sender=Country)
+@receiver(post_delete, sender=Country)
+def country_changed(sender, **kwargs):
+    # Covers the admin and DELETE /countries/:name; the refresh writes through
+    # bulk_create, which sends no signals, and invalidates on its own. Waiting
+    # for the commit keeps other requests from caching the old rows anew
+    transaction.on_commit(invalidate_countries_cache)
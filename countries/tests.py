@@ -1,3 +1,285 @@
-from django.test import TestCase
+import json
+import os
+import stat
+import tempfile
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import requests
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from .models import Country
+from .renderers import ORJSONRenderer
+from .utils import CountryDataFetcher, ExternalAPIError, SummaryImageGenerator, session
+
+RATES = {'result': 'success', 'rates': {'USD': 1, 'NGN': 1600.5, 'EUR': 0.92}}
+COUNTRIES = [
+    {'name': 'Nigeria', 'capital': 'Abuja', 'region': 'Africa', 'population': 206139589,
+     'flag': 'https://flagcdn.com/ng.svg', 'currencies': [{'code': 'NGN'}]},
+    {'name': 'Germany', 'capital': 'Berlin', 'region': 'Europe', 'population': 83240525,
+     'flag': 'https://flagcdn.com/de.svg', 'currencies': [{'code': 'EUR'}]},
+    {'name': 'Antarctica', 'region': 'Polar', 'population': 1000,
+     'flag': 'https://flagcdn.com/aq.svg'},
+    # Rejected by validation; the rest of the refresh must still go through
+    {'name': 'Nulltown', 'population': None},
+]
+
+def fake_get(countries, rates=RATES):
+    """session.get stand-in serving the given countries and rates"""
+    def get(url, **kwargs):
+        response = mock.Mock(url=url)
+        response.json.return_value = countries if url == settings.COUNTRIES_API_URL else rates
+        return response
+    return get
+
+class CountriesTestCase(TestCase):
+    def refresh(self, countries=COUNTRIES):
+        with mock.patch('countries.utils.session.get', side_effect=fake_get(countries)):
+            with self.captureOnCommitCallbacks(execute=True):
+                return CountryDataFetcher().refresh_countries_data()
+
+    def get_json(self, url, **extra):
+        response = self.client.get(url, **extra)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, json.loads(body) if body else None
+
+class RefreshTests(CountriesTestCase):
+    def test_first_refresh_creates_valid_rows(self):
+        result = self.refresh()
+
+        self.assertEqual(result, {'processed': 4, 'created': 3, 'updated': 0})
+        self.assertQuerySetEqual(
+            Country.objects.values_list('name', flat=True),
+            ['Antarctica', 'Germany', 'Nigeria']
+        )
+
+    def test_country_without_currency_gets_zero_gdp(self):
+        self.refresh()
+
+        antarctica = Country.objects.get(name='Antarctica')
+        self.assertIsNone(antarctica.currency_code)
+        self.assertIsNone(antarctica.exchange_rate)
+        self.assertEqual(antarctica.estimated_gdp, Decimal('0.00'))
+
+    def test_saving_refreshed_rows_keeps_their_gdp(self):
+        self.refresh()
+
+        for name in ('Germany', 'Antarctica'):
+            country = Country.objects.get(name=name)
+            gdp = country.estimated_gdp
+            # save() runs full_clean(), which rejects GDPs with more than 2 places
+            country.save()
+            country.refresh_from_db()
+            self.assertEqual(country.estimated_gdp, gdp)
+
+    def test_unchanged_refresh_writes_nothing(self):
+        self.refresh()
+
+        with CaptureQueriesContext(connection) as queries:
+            result = self.refresh()
+
+        self.assertEqual(result, {'processed': 4, 'created': 0, 'updated': 0})
+        writes = [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "countries"')]
+        self.assertEqual(writes, [])
+
+    def test_changed_country_is_updated(self):
+        self.refresh()
+        changed = [dict(COUNTRIES[0], capital='Lagos')] + COUNTRIES[1:]
+
+        result = self.refresh(changed)
+
+        self.assertEqual(result, {'processed': 4, 'created': 0, 'updated': 1})
+        self.assertEqual(Country.objects.get(name='Nigeria').capital, 'Lagos')
+
+class ExchangeRateTests(TestCase):
+    def fetch_rates(self, get):
+        with mock.patch('countries.utils.session.get', side_effect=get), \
+                mock.patch.object(session.cache, 'delete') as delete:
+            with self.assertRaises(ExternalAPIError):
+                CountryDataFetcher().fetch_exchange_rates()
+        return delete
+
+    def test_error_result_is_evicted_from_http_cache(self):
+        delete = self.fetch_rates(fake_get(COUNTRIES, rates={'result': 'error'}))
+
+        delete.assert_called_once_with(urls=[settings.EXCHANGE_RATE_API_URL])
+
+    def test_malformed_body_is_evicted_from_http_cache(self):
+        def get(url, **kwargs):
+            response = mock.Mock(url=url)
+            response.json.side_effect = requests.exceptions.JSONDecodeError('Expecting value', '<html>', 0)
+            return response
+
+        delete = self.fetch_rates(get)
+
+        delete.assert_called_once_with(urls=[settings.EXCHANGE_RATE_API_URL])
+
+class SummaryImageTests(CountriesTestCase):
+    def setUp(self):
+        self.refresh()
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = cache_dir.name
+        self.enterContext(override_settings(CACHE_DIR=self.cache_dir))
+
+    def test_render_swaps_in_a_readable_png(self):
+        image_path = SummaryImageGenerator().generate_summary_image()
+        # A second render replaces the file rather than leaving temp files behind
+        self.assertEqual(SummaryImageGenerator().generate_summary_image(), image_path)
+
+        self.assertEqual(image_path, os.path.join(self.cache_dir, 'summary.png'))
+        self.assertEqual(os.listdir(self.cache_dir), ['summary.png'])
+        self.assertEqual(stat.S_IMODE(os.stat(image_path).st_mode), 0o644)
+        with Image.open(image_path) as image:
+            self.assertEqual((image.format, image.size), ('PNG', (800, 600)))
+
+    def test_failed_render_keeps_previous_image(self):
+        image_path = SummaryImageGenerator().generate_summary_image()
+        with open(image_path, 'rb') as image_file:
+            previous = image_file.read()
+
+        with mock.patch('PIL.Image.Image.save', side_effect=OSError('disk full')), \
+                self.assertLogs('countries.utils', 'ERROR'):
+            self.assertIsNone(SummaryImageGenerator().generate_summary_image())
+
+        self.assertEqual(os.listdir(self.cache_dir), ['summary.png'])
+        with open(image_path, 'rb') as image_file:
+            self.assertEqual(image_file.read(), previous)
+
+class CountriesImageTests(TestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.enterContext(override_settings(CACHE_DIR=cache_dir.name))
+        self.image_path = os.path.join(cache_dir.name, 'summary.png')
+
+    def write_image(self, data, mtime):
+        with open(self.image_path, 'wb') as image_file:
+            image_file.write(data)
+        os.utime(self.image_path, (mtime, mtime))
+
+    def test_missing_image_returns_404(self):
+        response = self.client.get('/countries/image')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_etag_revalidates_until_image_changes(self):
+        self.write_image(b'first', 1700000000)
+        response = self.client.get('/countries/image')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response.content, b'first')
+        etag = response['ETag']
+
+        response = self.client.get('/countries/image', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        self.write_image(b'second', 1700000060)
+        response = self.client.get('/countries/image', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'second')
+
+class CountriesListTests(CountriesTestCase):
+    def setUp(self):
+        self.refresh()
+
+    def test_etag_revalidates_until_delete(self):
+        response, countries = self.get_json('/countries')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(countries), 3)
+        etag = response['ETag']
+
+        response = self.client.get('/countries', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete('/countries/germany')
+
+        response, countries = self.get_json('/countries', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([c['name'] for c in countries], ['Antarctica', 'Nigeria'])
+
+    def test_admin_edit_invalidates_cached_listing(self):
+        response, countries = self.get_json('/countries?region=europe')
+        self.assertEqual(countries[0]['capital'], 'Berlin')
+        etag = response['ETag']
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        germany = Country.objects.get(name='Germany')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/admin/countries/country/{germany.pk}/change/', {
+                'name': germany.name,
+                'capital': 'Bonn',
+                'region': germany.region,
+                'population': germany.population,
+                'currency_code': germany.currency_code,
+                'exchange_rate': germany.exchange_rate,
+                'estimated_gdp': germany.estimated_gdp,
+                'flag_url': germany.flag_url,
+            })
+        self.assertEqual(response.status_code, 302)
+
+        response, countries = self.get_json('/countries?region=europe', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(countries[0]['capital'], 'Bonn')
+        self.assertEqual(countries[0]['estimated_gdp'], f"{germany.estimated_gdp:f}")
+
+    def test_limit_returns_pagination_envelope(self):
+        response, page = self.get_json('/countries?limit=2&sort=population_desc')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(page), {'count', 'next', 'previous', 'results'})
+        self.assertEqual(page['count'], 3)
+        self.assertIsNone(page['previous'])
+        self.assertIn('offset=2', page['next'])
+        self.assertEqual([c['name'] for c in page['results']], ['Nigeria', 'Germany'])
+
+class CountryDetailTests(CountriesTestCase):
+    def test_missing_country_returns_error_body(self):
+        response, body = self.get_json('/countries/narnia')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(body, {'error': 'Country not found'})
+
+class StatusTests(CountriesTestCase):
+    def test_status_is_cached_until_next_refresh(self):
+        self.refresh()
+        response, first = self.get_json('/status')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(first['total_countries'], 3)
+
+        # bulk_create sends no signals, so the cached payload is still served
+        Country.objects.bulk_create([Country(name='Atlantis', population=1)])
+        self.assertEqual(self.get_json('/status')[1], first)
+
+        self.refresh()
+        response, status = self.get_json('/status')
+        self.assertEqual(status['total_countries'], 4)
+        self.assertNotEqual(status['last_refreshed_at'], first['last_refreshed_at'])
+
+class RendererTests(TestCase):
+    def test_orjson_output_matches_json_renderer(self):
+        data = {
+            'estimated_gdp': Decimal('1234.50'),
+            'last_refreshed_at': datetime(2026, 10, 14, 18, 33, 5, 123456, tzinfo=timezone.utc),
+            'naive': datetime(2026, 10, 14, 18, 33, 5),
+            'error': gettext_lazy('Country not found'),
+            'name': 'C\u00f4te d\u2019Ivoire \u2028\u2029',
+            'nested': [{'population': 1000, 'capital': None, 'ok': True}],
+        }
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(None), JSONRenderer().render(None))
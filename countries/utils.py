@@ -1,14 +1,59 @@
+import logging
 import requests
-import random
-from django.db import transaction
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession
+from urllib3.util.retry import Retry
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from django.core.exceptions import ValidationError
-from .models import Country, GlobalSettings
+from django.db import connection, transaction
+from .caching import invalidate_countries_cache
+from .models import Country, GlobalSettings, estimate_gdp
 from django.utils import timezone
 from PIL import Image, ImageDraw, ImageFont
 import os
 from django.conf import settings
 from decimal import Decimal, ROUND_HALF_UP
 
+logger = logging.getLogger(__name__)
+
+# Quantizer matching Country.exchange_rate's decimal_places
+_Q10 = Decimal('0.0000000001')
+
+# Upstream-derived columns; a refresh only rewrites countries where one of these changed
+COUNTRY_DATA_FIELDS = [
+    'capital', 'region', 'population', 'currency_code',
+    'exchange_rate', 'estimated_gdp', 'flag_url'
+]
+# Columns rewritten when a refresh upserts an existing country
+COUNTRY_REFRESH_FIELDS = COUNTRY_DATA_FIELDS + ['last_refreshed_at']
+
+# Shared session so repeated refreshes reuse pooled connections (and TLS handshakes).
+# Responses are cached on disk; upstream Cache-Control headers take precedence.
+session = CachedSession(
+    cache_name=os.path.join(settings.CACHE_DIR, 'http'),
+    backend='sqlite',
+    expire_after=3600,
+    cache_control=True,
+)
+# (connect, read) seconds per attempt
+API_TIMEOUT = (5, 10)
+# Transient failures (resets, 429/5xx) are retried with backoff before surfacing.
+# Retry-After is ignored so a 429 can't park the refresh request for minutes:
+# a stalled upstream costs each fetch at most 3 attempts * 15s plus 0.6s of backoff
+_retry = Retry(
+    total=2,
+    backoff_factor=0.3,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=['GET'],
+    respect_retry_after_header=False,
+)
+_adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=_retry)
+session.mount('https://', _adapter)
+session.mount('http://', _adapter)
+
 class ExternalAPIError(Exception):
     """Custom exception for external API errors"""
     pass
@@ -20,35 +65,51 @@ class CountryDataFetcher:
     def fetch_countries_data(self):
         """Fetch countries data from external API"""
         try:
-            print(f"Fetching countries from: {settings.COUNTRIES_API_URL}")
-            response = requests.get(settings.COUNTRIES_API_URL, timeout=30)
+            logger.info("Fetching countries from: %s", settings.COUNTRIES_API_URL)
+            response = session.get(settings.COUNTRIES_API_URL, timeout=API_TIMEOUT)
             response.raise_for_status()
             data = response.json()
-            print(f"Fetched {len(data)} countries")
+            logger.info("Fetched %d countries", len(data))
             return data
         except requests.exceptions.Timeout:
             raise ExternalAPIError("Countries API timeout")
         except requests.exceptions.ConnectionError:
             raise ExternalAPIError("Countries API connection error")
+        except requests.exceptions.JSONDecodeError as e:
+            # Don't keep serving a malformed body from the HTTP cache
+            session.cache.delete(urls=[response.url])
+            raise ExternalAPIError(f"Invalid data from countries API: {str(e)}")
         except requests.exceptions.RequestException as e:
             raise ExternalAPIError(f"Could not fetch data from countries API: {str(e)}")
     
     def fetch_exchange_rates(self):
         """Fetch exchange rates from external API"""
         try:
-            print(f"💱 Fetching exchange rates from: {settings.EXCHANGE_RATE_API_URL}")
-            response = requests.get(settings.EXCHANGE_RATE_API_URL, timeout=30)
+            logger.info("Fetching exchange rates from: %s", settings.EXCHANGE_RATE_API_URL)
+            response = session.get(settings.EXCHANGE_RATE_API_URL, timeout=API_TIMEOUT, expire_after=600)
             response.raise_for_status()
             data = response.json()
             if data.get('result') == 'success':
-                self.exchange_rates = data['rates']
-                print(f"Fetched {len(self.exchange_rates)} exchange rates")
+                # Parse each rate to a quantized Decimal once, up front, and intern
+                # the codes since every lookup in the refresh loop hashes them
+                self.exchange_rates = {
+                    sys.intern(code): Decimal(str(rate)).quantize(_Q10, rounding=ROUND_HALF_UP)
+                    for code, rate in data['rates'].items()
+                    if rate
+                }
+                logger.info("Fetched %d exchange rates", len(self.exchange_rates))
             else:
+                # An error body comes back as a 200, so the HTTP cache kept it
+                session.cache.delete(urls=[response.url])
                 raise ExternalAPIError("Exchange rate API returned error")
         except requests.exceptions.Timeout:
             raise ExternalAPIError("Exchange rates API timeout")
         except requests.exceptions.ConnectionError:
             raise ExternalAPIError("Exchange rates API connection error")
+        except requests.exceptions.JSONDecodeError as e:
+            # Don't keep serving a malformed body from the HTTP cache
+            session.cache.delete(urls=[response.url])
+            raise ExternalAPIError(f"Invalid data from exchange rates API: {str(e)}")
         except requests.exceptions.RequestException as e:
             raise ExternalAPIError(f"Could not fetch data from exchange rates API: {str(e)}")
     
@@ -57,29 +118,101 @@ class CountryDataFetcher:
         if not currencies or len(currencies) == 0:
             return None  
         first_currency = currencies[0]
-        return first_currency.get('code')
+        code = first_currency.get('code')
+        return sys.intern(code) if code else code
     
     def get_exchange_rate(self, currency_code):
         """Get exchange rate for currency code"""
         if not currency_code or not self.exchange_rates:
             return None
         
-        rate = self.exchange_rates.get(currency_code)
-        if rate:
-            return Decimal(str(rate)).quantize(Decimal('0.0000000001'), rounding=ROUND_HALF_UP)
-        return None  
+        return self.exchange_rates.get(currency_code)
     
     def refresh_countries_data(self):
         """Main method to refresh all countries data - EXACTLY as per requirements"""
-        # Fetch exchange rates first
-        self.fetch_exchange_rates()
-        
-        # Fetch countries data
-        countries_data = self.fetch_countries_data()
+        # Both upstream APIs are independent, so fetch them concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            rates_future = executor.submit(self.fetch_exchange_rates)
+            countries_future = executor.submit(self.fetch_countries_data)
+            rates_future.result()
+            countries_data = countries_future.result()
         
         processed = 0
-        created = 0
-        updated = 0
+        
+        # Current upstream-derived values per name, so unchanged countries can be
+        # left alone; the upsert below resolves conflicts on name by itself
+        existing = {
+            name: values
+            for name, *values in Country.objects.values_list('name', *COUNTRY_DATA_FIELDS).iterator(chunk_size=1000)
+        }
+        rows = {}
+        
+        for country_data in countries_data:
+            try:
+                processed += 1
+                
+              
+                name = country_data.get('name')
+                if not name:
+                    continue 
+                
+                population = country_data.get('population', 0)
+                if population is None:
+                    # Country.clean() rejects this too; skip before the GDP math needs it
+                    logger.warning("Validation error for %s: population is required", name)
+                    continue
+                currencies = country_data.get('currencies', [])
+                currency_code = self.get_currency_code(currencies)
+                
+                # IMPLEMENT EXACT CURRENCY HANDLING LOGIC FROM REQUIREMENTS:
+                # no currency -> GDP 0, unknown rate -> GDP None (see estimate_gdp)
+                if not currencies or not currency_code:
+                    currency_code = None  
+                    exchange_rate = None  
+                else:
+                    exchange_rate = self.get_exchange_rate(currency_code)
+                
+                estimated_gdp = estimate_gdp(name, population, currency_code, exchange_rate)
+                
+                # REQUIREMENT: Still store the country record (in all cases)
+                country = Country(
+                    name=name,
+                    capital=country_data.get('capital'),
+                    region=country_data.get('region'),
+                    population=population,
+                    currency_code=currency_code,
+                    exchange_rate=exchange_rate,
+                    estimated_gdp=estimated_gdp,
+                    flag_url=country_data.get('flag'),
+                )
+                # bulk_create skips save(), so validate here to drop just the bad
+                # row (over-long values, bad URLs) instead of failing the batch;
+                # uniqueness is left to the upsert, saving a SELECT per row
+                country.full_clean(validate_unique=False, validate_constraints=False)
+                rows[name] = country
+                
+            except ValidationError as e:
+                logger.warning("Validation error for %s: %s", name, e.message_dict)
+                continue
+            except Exception as e:
+                logger.warning("Error processing %s: %s", country_data.get('name', 'Unknown'), e)
+                continue
+        
+        # GDP is deterministic per country, so most rows match what is stored;
+        # only write new countries and ones whose upstream data changed
+        changed = {
+            name: country for name, country in rows.items()
+            if existing.get(name) != [getattr(country, field) for field in COUNTRY_DATA_FIELDS]
+        }
+        
+        # Per-row detail is DEBUG only; skip the loop entirely when it's filtered out
+        if logger.isEnabledFor(logging.DEBUG):
+            for name, country in changed.items():
+                action = "Updated" if name in existing else "Created"
+                logger.debug("%s: %s (Currency: %s, GDP: %s)", action, name, country.currency_code, country.estimated_gdp)
+        
+        updated = len(existing.keys() & changed.keys())
+        created = len(changed) - updated
         
         with transaction.atomic():
             # Update global refresh timestamp at the start of transaction
@@ -87,69 +220,22 @@ class CountryDataFetcher:
                 key='last_global_refresh',
                 defaults={'value': timezone.now().isoformat()}
             )
-            print(f"Global refresh timestamp updated: {global_settings.last_updated}")
+            logger.info("Global refresh timestamp updated: %s", global_settings.last_updated)
             
-            for country_data in countries_data:
-                try:
-                    processed += 1
-                    
-                  
-                    name = country_data.get('name')
-                    if not name:
-                        continue 
-                    
-                    population = country_data.get('population', 0)
-                    currencies = country_data.get('currencies', [])
-                    currency_code = self.get_currency_code(currencies)
-                    
-                    # IMPLEMENT EXACT CURRENCY HANDLING LOGIC FROM REQUIREMENTS:
-                    exchange_rate = None
-                    estimated_gdp = None
-                    
-                    if not currencies or not currency_code:
-                        currency_code = None  
-                        exchange_rate = None  
-                        estimated_gdp = 0     
-                    else:
-                        exchange_rate = self.get_exchange_rate(currency_code)
-                        
-                        if exchange_rate is None:
-                            estimated_gdp = None  
-                        else:
-                            
-                            random_multiplier = random.uniform(1000, 2000)
-                            gdp_value = (population * random_multiplier) / float(exchange_rate)
-                            estimated_gdp = Decimal(str(gdp_value)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                    
-                    # REQUIREMENT: Still store the country record (in all cases)
-                    country, created_flag = Country.objects.update_or_create(
-                        name=name,
-                        defaults={
-                            'capital': country_data.get('capital'),
-                            'region': country_data.get('region'),
-                            'population': population,
-                            'currency_code': currency_code,  
-                            'exchange_rate': exchange_rate,  
-                            'estimated_gdp': estimated_gdp,  
-                            'flag_url': country_data.get('flag')
-                        }
-                    )
-                    
-                    if created_flag:
-                        created += 1
-                        print(f"Created: {name} (Currency: {currency_code}, GDP: {estimated_gdp})")
-                    else:
-                        updated += 1
-                        print(f"Updated: {name} (Currency: {currency_code}, GDP: {estimated_gdp})")
-                        
-                except ValidationError as e:
-                    print(f"Validation error for {country_data.get('name', 'Unknown')}: {e.message_dict}")
-                    continue
-                except Exception as e:
-                    print(f"Error processing {country_data.get('name', 'Unknown')}: {str(e)}")
-                    continue
+            # One INSERT ... ON CONFLICT DO UPDATE (ON DUPLICATE KEY UPDATE on MySQL)
+            # per batch; bulk_create bypasses Country.save(), so no per-row full_clean()
+            Country.objects.bulk_create(
+                changed.values(),
+                batch_size=500,
+                update_conflicts=True,
+                # MySQL upserts on any unique key and rejects an explicit target
+                unique_fields=['name'] if connection.features.supports_update_conflicts_with_target else None,
+                update_fields=COUNTRY_REFRESH_FIELDS,
+            )
+            # bulk_create sends no post_save, so drop cached listings/status here
+            transaction.on_commit(invalidate_countries_cache)
         
-        print(f"🎉 Refresh completed: {processed} processed, {created} created, {updated} updated")
+        logger.info("Refresh completed: %d processed, %d created, %d updated", processed, created, updated)
         
         return {
             'processed': processed,
@@ -157,37 +243,54 @@ class CountryDataFetcher:
             'updated': updated
         }
 
+@lru_cache(maxsize=8)
+def _get_font(size):
+    """Load (once per size) the font used for the summary image"""
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except IOError:
+        return ImageFont.load_default()
+
+@lru_cache(maxsize=1)
+def _get_background(width, height):
+    """Blank summary canvas; callers draw on a copy"""
+    return Image.new('RGB', (width, height), color=(240, 240, 240))
+
 class SummaryImageGenerator:
     def generate_summary_image(self):
         """Generate summary image with country statistics"""
         try:
-            print("Generating summary image...")
+            logger.info("Generating summary image...")
             # Get data for summary
             total_countries = Country.objects.count()
-            top_countries = Country.objects.exclude(estimated_gdp__isnull=True).order_by('-estimated_gdp')[:5]
             
-            # Use global refresh timestamp
-            try:
-                global_refresh = GlobalSettings.objects.get(key='last_global_refresh')
-                last_refresh_time = global_refresh.last_updated
-            except GlobalSettings.DoesNotExist:
-                last_refresh_time = timezone.now()
+            # Unchanged rows aren't rewritten, so Max(last_refreshed_at) is the last
+            # change; draw the global refresh time /status reports instead
+            last_refresh = (
+                GlobalSettings.objects.filter(key='last_global_refresh')
+                .values_list('last_updated', flat=True)
+                .first()
+            )
+            last_refresh_time = last_refresh or timezone.now()
+            image_path = os.path.join(settings.CACHE_DIR, 'summary.png')
+            
+            top_countries = list(
+                # filter(isnull=False) matches the partial index condition verbatim
+                Country.objects.filter(estimated_gdp__isnull=False)
+                .order_by('-estimated_gdp')
+                .values_list('name', 'estimated_gdp')[:5]
+            )
             
             # Create image
             img_width = 800
             img_height = 600
-            image = Image.new('RGB', (img_width, img_height), color=(240, 240, 240))
+            image = _get_background(img_width, img_height).copy()
             draw = ImageDraw.Draw(image)
             
             # Font sizes
-            try:
-                large_font = ImageFont.truetype("arial.ttf", 32)
-                medium_font = ImageFont.truetype("arial.ttf", 24)
-                small_font = ImageFont.truetype("arial.ttf", 18)
-            except IOError:
-                large_font = ImageFont.load_default()
-                medium_font = ImageFont.load_default()
-                small_font = ImageFont.load_default()
+            large_font = _get_font(32)
+            medium_font = _get_font(24)
+            small_font = _get_font(18)
             
             # Title
             draw.text((50, 50), "Country Data Summary", fill=(0, 100, 200), font=large_font)
@@ -201,20 +304,47 @@ class SummaryImageGenerator:
             draw.text((50, 220), "Top 5 Countries by Estimated GDP:", fill=(0, 100, 200), font=medium_font)
             
             y_position = 270
-            for i, country in enumerate(top_countries, 1):
-                gdp_value = float(country.estimated_gdp) if country.estimated_gdp else 0
+            for i, (name, estimated_gdp) in enumerate(top_countries, 1):
+                gdp_value = float(estimated_gdp) if estimated_gdp else 0
                 gdp_formatted = f"${gdp_value:,.2f}"
-                text = f"{i}. {country.name}: {gdp_formatted}"
+                text = f"{i}. {name}: {gdp_formatted}"
                 draw.text((70, y_position), text, fill=(0, 0, 0), font=small_font)
                 y_position += 35
             
-            # Save image
-            image_path = os.path.join(settings.CACHE_DIR, 'summary.png')
-            image.save(image_path, 'PNG')
-            print(f"Summary image saved: {image_path}")
+            # Save image - the summary is flat text on a solid background, so a
+            # 16-colour palette with light zlib compression encodes faster and smaller
+            image = image.quantize(colors=16, method=Image.Quantize.FASTOCTREE)
+            # Written to a uniquely named file and swapped in, so concurrent GETs
+            # never read a partial PNG and overlapping renders (e.g. from other
+            # server processes) never write the same temp file
+            fd, tmp_path = tempfile.mkstemp(dir=settings.CACHE_DIR, prefix='summary-', suffix='.png')
+            try:
+                with os.fdopen(fd, 'wb') as tmp_file:
+                    image.save(tmp_file, 'PNG', compress_level=1)
+                # mkstemp creates 0600; keep the permissions a plain save() gave
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, image_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            logger.info("Summary image saved: %s", image_path)
             
             return image_path
             
         except Exception as e:
-            print(f"Error generating summary image: {str(e)}")
-            return None
\ No newline at end of file
+            logger.exception("Error generating summary image: %s", e)
+            return None
+
+# Single worker: renders run off the request thread, one at a time per process
+_image_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='summary-image')
+
+def _generate_summary_image():
+    try:
+        SummaryImageGenerator().generate_summary_image()
+    finally:
+        # The worker thread opens its own DB connection; release it after each render
+        connection.close()
+
+def schedule_summary_image():
+    """Queue a summary image render on the background worker"""
+    return _image_executor.submit(_generate_summary_image)
\ No newline at end of file
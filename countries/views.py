@@ -1,15 +1,131 @@
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.exceptions import NotFound
-from django.db.models import Q
-from django.http import HttpResponse
+from rest_framework.exceptions import NotFound, ValidationError
+from django.db import transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Upper
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+import hashlib
+import logging
+import orjson
 import os
+from functools import lru_cache
+from types import MappingProxyType
 
+from .caching import STATUS_CACHE_KEY, countries_version
 from .models import Country, GlobalSettings
+from .pagination import CountryPagination
 from .serializers import CountrySerializer
-from .utils import CountryDataFetcher, ExternalAPIError, SummaryImageGenerator
+from .utils import CountryDataFetcher, ExternalAPIError, schedule_summary_image
 from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Cache lifetime; entries also expire early when the data version changes
+LIST_CACHE_TIMEOUT = 600
+
+# Query parameters accepted by CountriesListView, in documented order plus
+# a frozenset for the per-request membership check
+LIST_QUERY_PARAMS = ('region', 'currency', 'sort', 'limit', 'offset')
+LIST_QUERY_PARAM_SET = frozenset(LIST_QUERY_PARAMS)
+
+# ?sort= values and their ordering; anything else falls back to name.
+# GDP sorts also drop countries without an estimate
+SORTING_MAP = MappingProxyType({
+    'gdp_desc': '-estimated_gdp',
+    'gdp_asc': 'estimated_gdp',
+    'population_desc': '-population',
+    'population_asc': 'population',
+    'name_asc': 'name',
+    'name_desc': '-name',
+})
+GDP_SORTS = frozenset(('gdp_desc', 'gdp_asc'))
+
+# Decimal columns that CountrySerializer renders as fixed-point strings
+DECIMAL_FIELDS = ('exchange_rate', 'estimated_gdp')
+
+# Rows fetched from the cursor, and encoded per streamed chunk, at a time
+STREAM_CHUNK_SIZE = 500
+
+def countries_etag(request, *args, **kwargs):
+    """
+    ETag for listings: the data version, kept on the request so the view
+    body reuses it rather than reading it from the cache again. Weak, as
+    GZipMiddleware would make it on a compressed 200, so a 304 (which it
+    leaves alone) repeats the same validator
+    """
+    request.countries_version = countries_version()
+    return f'W/"{request.countries_version}"'
+
+@lru_cache(maxsize=1)
+def read_summary_image(path, mtime_ns, size):
+    """
+    Summary image bytes, re-read only when the file's mtime/size change
+    """
+    with open(path, 'rb') as image_file:
+        return image_file.read()
+
+def filter_iexact(queryset, field, value):
+    """
+    Case-insensitive equality as UPPER(field) = UPPER(value); unlike __iexact
+    (LIKE on SQLite/MySQL) this can use the Upper(field) expression indexes
+    """
+    alias = f'{field}_upper'
+    return queryset.alias(**{alias: Upper(field)}).filter(**{alias: Upper(Value(value))})
+
+def country_values(queryset):
+    """
+    Read countries as plain dicts, skipping model instantiation
+    """
+    return queryset.values(*CountrySerializer.Meta.fields)
+
+def country_rows(rows):
+    """
+    Shape country_values() rows like CountrySerializer output without the
+    per-field serializer calls
+    """
+    for row in rows:
+        for field in DECIMAL_FIELDS:
+            if row[field] is not None:
+                row[field] = f"{row[field]:f}"
+        yield row
+
+def json_array_stream(rows):
+    """
+    Encode rows as a single JSON array, yielding STREAM_CHUNK_SIZE rows per
+    chunk so the full payload is never held in memory at once
+    """
+    yield b'['
+    batch = []
+    separator = b''
+    for row in rows:
+        batch.append(orjson.dumps(row, option=orjson.OPT_UTC_Z))
+        if len(batch) == STREAM_CHUNK_SIZE:
+            yield separator + b','.join(batch)
+            batch = []
+            separator = b','
+    if batch:
+        yield separator + b','.join(batch)
+    yield b']'
+
+def cache_stream(key, chunks, version):
+    """
+    Pass chunks through to the client, caching the joined body once the
+    stream has been sent in full
+    """
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(parts), LIST_CACHE_TIMEOUT, version=version)
 
 class RefreshCountriesView(APIView):
     """
@@ -18,13 +134,12 @@ class RefreshCountriesView(APIView):
     """
     def post(self, request):
         try:
-            print("Starting countries refresh...")
+            logger.info("Starting countries refresh...")
             fetcher = CountryDataFetcher()
             result = fetcher.refresh_countries_data()
             
-            # Generate summary image after refresh
-            image_generator = SummaryImageGenerator()
-            image_generator.generate_summary_image()
+            # Render the summary image in the background once the data is committed
+            transaction.on_commit(schedule_summary_image)
             
             response_data = {
                 'message': 'Countries data refreshed successfully',
@@ -46,55 +161,81 @@ class RefreshCountriesView(APIView):
                 'error': 'Internal server error'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@method_decorator(gzip_page, name='dispatch')
+# Outside condition() so bodiless 304s also carry the Vary a gzipped 200 has
+@method_decorator(vary_on_headers('Accept-Encoding'), name='get')
+@method_decorator(condition(etag_func=countries_etag), name='get')
 class CountriesListView(APIView):
     """
     GET /countries
-    Get all countries with filtering and sorting
+    Get all countries with filtering and sorting; ?limit=/?offset= paginate
     """
-    def get(self, request):
-        # Define valid query parameters
-        valid_params = ['region', 'currency', 'sort']
-        provided_params = request.query_params.keys()
+    pagination_class = CountryPagination
+    
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
         
-        # Check for invalid parameters
-        invalid_params = [param for param in provided_params if param not in valid_params]
+        # Reject unknown query parameters before any queryset is built
+        invalid_params = set(request.query_params).difference(LIST_QUERY_PARAM_SET)
         if invalid_params:
-            return Response({
+            raise ValidationError({
                 'error': 'Invalid query parameters',
-                'invalid_parameters': invalid_params,
-                'valid_parameters': valid_params
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
+                'invalid_parameters': sorted(invalid_params),
+                'valid_parameters': list(LIST_QUERY_PARAMS)
+            })
+    
+    def build_queryset(self, region, currency, sort_by):
+        """
+        Filtered, ordered countries for already-validated list parameters
+        """
         queryset = Country.objects.all()
         
         # Apply filters for valid parameters
-        region = request.query_params.get('region')
         if region:
-            queryset = queryset.filter(region__iexact=region)
+            queryset = filter_iexact(queryset, 'region', region)
         
-        currency = request.query_params.get('currency')
         if currency:
-            queryset = queryset.filter(currency_code__iexact=currency)
+            queryset = filter_iexact(queryset, 'currency_code', currency)
         
         # Apply sorting
-        sort_by = request.query_params.get('sort')
-        if sort_by == 'gdp_desc':
-            queryset = queryset.exclude(estimated_gdp__isnull=True).order_by('-estimated_gdp')
-        elif sort_by == 'gdp_asc':
-            queryset = queryset.exclude(estimated_gdp__isnull=True).order_by('estimated_gdp')
-        elif sort_by == 'population_desc':
-            queryset = queryset.order_by('-population')
-        elif sort_by == 'population_asc':
-            queryset = queryset.order_by('population')
-        elif sort_by == 'name_asc':
-            queryset = queryset.order_by('name')
-        elif sort_by == 'name_desc':
-            queryset = queryset.order_by('-name')
-        else:
-            queryset = queryset.order_by('name')
+        if sort_by in GDP_SORTS:
+            # IS NOT NULL matches country_gdp_notnull_desc's condition, so the
+            # partial index filters and orders in one scan; exclude() emits
+            # NOT (... IS NULL), which the planner won't match to it
+            queryset = queryset.filter(estimated_gdp__isnull=False)
+        return queryset.order_by(SORTING_MAP[sort_by])
+    
+    def get(self, request):
+        region = request.query_params.get('region', '')
+        currency = request.query_params.get('currency', '')
+        # Unknown sorts order by name, so they share name_asc's cache entry
+        sort_by = request.query_params.get('sort', '')
+        if sort_by not in SORTING_MAP:
+            sort_by = 'name_asc'
         
-        serializer = CountrySerializer(queryset, many=True)
-        return Response(serializer.data)
+        paginator = self.pagination_class()
+        if paginator.is_requested(request):
+            queryset = self.build_queryset(region, currency, sort_by)
+            page = paginator.paginate_queryset(country_values(queryset), request, view=self)
+            return paginator.get_paginated_response(list(country_rows(page)))
+        
+        # Full listings only change with the data, so serve repeats from cache
+        # before any queryset is built
+        # Filters are hashed as given: case-folding them here could merge values
+        # the database's UPPER() keeps apart, and cache_key is varchar(255)
+        filters = hashlib.sha256(f"{region}\0{currency}".encode('utf-8')).hexdigest()
+        key = f"countries:{sort_by}:{filters}"
+        version = request.countries_version
+        body = cache.get(key, version=version)
+        if body is not None:
+            return HttpResponse(body, content_type='application/json')
+        
+        queryset = self.build_queryset(region, currency, sort_by)
+        rows = country_values(queryset).iterator(chunk_size=STREAM_CHUNK_SIZE)
+        return StreamingHttpResponse(
+            cache_stream(key, json_array_stream(country_rows(rows)), version),
+            content_type='application/json'
+        )
 
 class CountryDetailView(APIView):
     """
@@ -103,31 +244,25 @@ class CountryDetailView(APIView):
     """
     def get_object(self, name):
         try:
-            return Country.objects.get(name__iexact=name)
+            # Only the columns the serializer renders
+            queryset = Country.objects.only(*CountrySerializer.Meta.fields)
+            return filter_iexact(queryset, 'name', name).get()
         except Country.DoesNotExist:
             raise NotFound('Country not found')
     
     def get(self, request, name):
-        try:
-            country = self.get_object(name)
-            serializer = CountrySerializer(country)
-            return Response(serializer.data)
-        except NotFound as e:
-            return Response({
-                'error': str(e)
-            }, status=status.HTTP_404_NOT_FOUND)
+        # A miss raises NotFound, rendered as a 404 by the exception handler
+        country = self.get_object(name)
+        serializer = CountrySerializer(country)
+        return Response(serializer.data)
     
     def delete(self, request, name):
-        try:
-            country = self.get_object(name)
-            country.delete()
-            return Response({
-                'message': f'Country {name} deleted successfully'
-            }, status=status.HTTP_200_OK)
-        except NotFound as e:
-            return Response({
-                'error': str(e)
-            }, status=status.HTTP_404_NOT_FOUND)
+        country = self.get_object(name)
+        # The post_delete handler drops the cached listings/status
+        country.delete()
+        return Response({
+            'message': f'Country {name} deleted successfully'
+        }, status=status.HTTP_200_OK)
 
 class StatusView(APIView):
     """
@@ -135,19 +270,22 @@ class StatusView(APIView):
     Get API status and statistics
     """
     def get(self, request):
-        total_countries = Country.objects.count()
-        try:
-            global_refresh = GlobalSettings.objects.get(key='last_global_refresh')
-            last_refreshed_at = global_refresh.last_updated
-        except GlobalSettings.DoesNotExist:
-            last_refreshed_at = None
+        # Dropped whenever a country is refreshed, edited or deleted, so a short TTL is safe
+        status_data = cache.get_or_set(STATUS_CACHE_KEY, self.get_status_data, timeout=30)
+        return Response(status_data)
+    
+    def get_status_data(self):
+        # Read just the timestamp column; None until the first refresh
+        last_refreshed_at = (
+            GlobalSettings.objects.filter(key='last_global_refresh')
+            .values_list('last_updated', flat=True)
+            .first()
+        )
         
-        status_data = {
-            'total_countries': total_countries,
+        return {
+            'total_countries': Country.objects.count(),
             'last_refreshed_at': last_refreshed_at
         }
-        
-        return Response(status_data)
 
 class CountriesImageView(APIView):
     """
@@ -157,15 +295,31 @@ class CountriesImageView(APIView):
     def get(self, request):
         image_path = os.path.join(settings.CACHE_DIR, 'summary.png')
         
-        if not os.path.exists(image_path):
+        # One stat() both checks existence and yields the cache validators
+        try:
+            image_stat = os.stat(image_path)
+        except FileNotFoundError:
             return Response({
                 'error': 'Summary image not found'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        try:
-            with open(image_path, 'rb') as f:
-                return HttpResponse(f.read(), content_type='image/png')
-        except Exception as e:
-            return Response({
-                'error': 'Internal server error'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        etag = quote_etag(f"{image_stat.st_mtime_ns:x}-{image_stat.st_size:x}")
+        last_modified = int(image_stat.st_mtime)
+        
+        # Repeat polls with a matching If-None-Match/If-Modified-Since get a bodiless 304
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            try:
+                # Served from memory until a refresh rewrites the file
+                image_data = read_summary_image(image_path, image_stat.st_mtime_ns, image_stat.st_size)
+                response = HttpResponse(image_data, content_type='image/png')
+            except Exception as e:
+                return Response({
+                    'error': 'Internal server error'
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        # The image only changes when /countries/refresh runs
+        patch_cache_control(response, max_age=3600)
+        return response
@@ -104,12 +104,30 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'countries.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
-    ]
+    ],
+    'EXCEPTION_HANDLER': 'countries.exceptions.api_exception_handler',
 }
+# Logging - per-row refresh detail is logged at DEBUG, so INFO keeps it quiet
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'countries': {
+            'handlers': ['console'],
+            'level': env('COUNTRIES_LOG_LEVEL', default='INFO'),
+        },
+    },
+}
+
 # CORS configuration
 CORS_ALLOW_ALL_ORIGINS = True
 